@@ -14,6 +14,8 @@ Whois shows information about a user. If you have img2txt installed (from libcac
 it will also show the profile image.
 
 On the room list, press Alt-j to join a room.
+Press Alt-s to select or unselect a room, and type 'join' to join all selected rooms. On the
+autojoin list, 'join' without a selection joins all rooms in the list.
 Type 'filter x' to filter the list by x.
 
 Auto completion
@@ -25,6 +27,30 @@ The plugin adds completion on @mentions. This needs to be enabled in weechat:
 
 After that just type @<tab> to try it out.
 
+Mentions
+--------
+
+@mentions of known users in incoming messages on the bitlbee server are followed by the user's
+full name. The server is named by the server setting, which defaults to bitlbee:
+/set plugins.var.python.hipchat.server <server name>
+To disable this:
+/set plugins.var.python.hipchat.annotate_mentions off
+
+If your Hipchat mention name differs from your IRC nick, set it to get highlighted when
+you are mentioned:
+/set plugins.var.python.hipchat.mention_name <mention name>
+
+Other scripts
+-------------
+
+The user and room lists are available to other scripts. They are served from the lists this
+plugin keeps; the first lookup loads them if that hasn't happened yet:
+
+info hipchat_fullname <@mention>  # full name of a user
+info hipchat_mention <@mention>  # mention name of a user, with Hipchat's capitalization
+infolist hipchat_user <@mention>  # id, mention_name and name
+infolist hipchat_room <pattern>  # id, name and xmpp_jid (once joined) of rooms matching pattern
+
 Full name support
 -----------------
 
@@ -32,10 +58,17 @@ When the plugin starts, it will fetch a complete list of user from Hipchat and a
 to the nicklist.
 To disable this feature:
 /set plugins.var.python.hipchat.enable_fullnames off
+
+The user list is not loaded while the script itself loads. It is read from disk and synced
+with Hipchat once weechat has been idle for startup_delay seconds, or as soon as it is first
+needed. To load it immediately instead:
+/set plugins.var.python.hipchat.startup_delay 0
 """
 
 import json
 import os
+import re
+import urllib2
 import weechat
 
 rooms_buffer = None
@@ -56,12 +89,43 @@ rooms_settings = (
                                 "the channel list. If a channelname is shorter than "
                                 "this amount, the column will be padded with spaces."),
     ('enable_fullnames', 'on', 'If on, the nicklist will also contain full names of all users'),
+    ('startup_delay', '5', 'Seconds to wait after loading the script before loading and syncing '
+                           'the user list. 0 loads it immediately.'),
+    ('annotate_mentions', 'on', 'If on, @mentions in incoming messages are followed by the full '
+                                'name of the user'),
+    ('server', 'bitlbee', 'Name of the bitlbee server connected to Hipchat. Incoming @mentions '
+                          'are only annotated on this server.'),
+    ('mention_name', '', 'Your own mention name, if it differs from your IRC nick. Messages '
+                         'mentioning it are highlighted.'),
+    ('fetch_worker', 'on', 'If on, user and room lists are downloaded and parsed in a background '
+                           'process instead of in weechat itself (needs weechat >= 1.5)'),
 )
 rooms_filter = None
 rooms_channels_filtered = []
+rooms_selected = set()
+rooms_autojoin = False
+rooms_generation = 0
+rooms_join_pending = 0
+rooms_join_unsaved = False
+rooms_join_seq = 0
+add_room_output = {}
+room_jids = None
+room_index = {}
+room_index_data = ''
 room_data = None
 nicklist = None
 nicklist_data = ''
+nicklist_mentions = {}
+mention_re = re.compile(r'<[^>]*>|(?<![\w.@/])@(\w+)')
+mention_highlight_buffers = set()
+fetch_worker_seq = 0
+fetch_worker_output = {}
+fetch_worker_fields = {
+    'users': ('id', 'mention_name', 'name'),
+    'rooms': ('id', 'name'),
+    'autojoin': ('id', 'name'),
+    'room_index': ('id', 'name'),
+}
 
 
 def hipchat_cmd(data, buffer, args):
@@ -76,15 +140,12 @@ def hipchat_cmd(data, buffer, args):
             keyEvent(data, buffer, room_args[-1][2:])
             return weechat.WEECHAT_RC_OK
         rooms_initialise_list(bitlbee_server)
-
-        weechat.hook_process("url:https://api.hipchat.com/v2/room?auth_token=%s&max-results=1000" %
-                             get_token(), 30 * 1000, "room_list_cb", "")
+        rooms_download('https://api.hipchat.com/v2/room?max-results=1000', 'rooms')
     elif args == 'autojoin':
         rooms_initialise_list(bitlbee_server)
         nick = weechat.info_get('irc_nick', bitlbee_server)
-        weechat.hook_process('url:https://api.hipchat.com/v2/user/@%s/preference/auto-join?'
-                             'auth_token=%s&max-results=500' % (nick, get_token()),
-                             30 * 1000, 'room_list_cb', '')
+        rooms_download('https://api.hipchat.com/v2/user/@%s/preference/auto-join?max-results=500' %
+                       nick, 'autojoin')
     elif args.startswith('whois'):
         whois_start(args[5:].strip())
 
@@ -144,20 +205,33 @@ def img_cb(data, command, rc, out, err):
     return weechat.WEECHAT_RC_OK
 
 
+def rooms_download(url, kind):
+    """Download the room list of the given kind ('rooms' or 'autojoin') into the room buffer."""
+    if fetch_worker_enabled():
+        fetch_worker_start(kind, url, rooms_generation)
+    else:
+        weechat.hook_process('url:%s&auth_token=%s' % (url, get_token()),
+                             30 * 1000, 'room_list_cb', '%s %s' % (rooms_generation, kind))
+
+
 def room_list_cb(data, command, rc, out, err):
-    global rooms_channels, rooms_data
+    global rooms_data
+
+    # Drop the results of downloads started for an earlier list.
+    generation, kind = data.split(' ', 1)
+    if int(generation) != rooms_generation:
+        return weechat.WEECHAT_RC_OK
 
     try:
-        data = json.loads(rooms_data + out)
-        for d in data['items']:
-            rooms_channels.append(d)
+        page = json.loads(rooms_data + out)
+        rooms_list_add(page['items'])
 
         rooms_list_end()
-        if 'links' in data and 'next' in data['links']:
-            weechat.hook_process('url:%s&auth_token=%s' % (data['links']['next'], get_token()),
-                                 30000, 'room_list_cb', '')
+        if 'links' in page and 'next' in page['links']:
+            weechat.hook_process('url:%s&auth_token=%s' % (page['links']['next'], get_token()),
+                                 30000, 'room_list_cb', data)
         else:
-            rooms_list_end()
+            rooms_list_done(kind)
         rooms_data = ''
     except (TypeError, ValueError):
         rooms_data += out
@@ -165,25 +239,100 @@ def room_list_cb(data, command, rc, out, err):
     return weechat.WEECHAT_RC_OK
 
 
-def add_room_start(room):
+def rooms_list_done(kind):
+    global rooms_autojoin
+    rooms_autojoin = kind == 'autojoin'
+    rooms_list_end()
+
+
+def rooms_list_add(items):
+    global rooms_channels
+    for d in items:
+        rooms_channels.append(d)
+    room_index_add(items)
+
+
+def rooms_join(rooms):
+    """Join a number of rooms, saving the bitlbee configuration once when all are added."""
+    global rooms_join_pending
+    server = weechat.buffer_get_string(rooms_buffer, 'localvar_bitlbee_server')
+    room_jids_load()
+
+    for room in rooms:
+        xmpp = room.get('xmpp_jid') or room_jids.get(str(room['id']))
+        if xmpp:
+            add_room(server, xmpp)
+        else:
+            rooms_join_pending += 1
+            add_room_start(server, room)
+    add_room_save(server)
+
+
+def add_room_start(server, room):
+    global rooms_join_seq
+    rooms_join_seq += 1
     weechat.hook_process('url:https://api.hipchat.com/v2/room/%s?auth_token=%s' %
                          (room['id'], get_token()),
-                         30000, 'add_room_cb', '')
+                         30000, 'add_room_cb', '%s %s' % (rooms_join_seq, server))
 
 
 def add_room_cb(data, command, rc, out, err):
-    global rooms_buffer
-    server = weechat.buffer_get_string(rooms_buffer, 'localvar_bitlbee_server')
+    global rooms_join_pending
+    seq, server = data.split(' ', 1)
+    add_room_output[seq] = add_room_output.get(seq, '') + out
+    if int(rc) == weechat.WEECHAT_HOOK_PROCESS_RUNNING:
+        return weechat.WEECHAT_RC_OK
 
-    weechat.prnt('', 'Join hipchat %s' % out)
-    data = json.loads(out)
-    xmpp = data['xmpp_jid']
+    out = add_room_output.pop(seq)
+    rooms_join_pending = max(rooms_join_pending - 1, 0)
+    try:
+        room = json.loads(out)
+        room_jids[str(room['id'])] = room['xmpp_jid']
+        room_index[room['id']] = room
+        add_room(server, room['xmpp_jid'])
+    except (KeyError, TypeError, ValueError):
+        weechat.prnt('', 'Failed to get room info: %s' % (out or err))
+    if not rooms_join_pending:
+        room_jids_save()
+    add_room_save(server)
+    return weechat.WEECHAT_RC_OK
+
+
+def room_jids_load():
+    global room_jids
+    if room_jids is not None:
+        return
+
+    room_jids = {}
+    f = os.path.join(hipchat_dir(), 'rooms.json')
+    if os.path.exists(f):
+        with open(f) as f:
+            room_jids = json.load(f)
+
+
+def room_jids_save():
+    f = os.path.join(hipchat_dir(), 'rooms.json')
+    with open(f, 'w') as f:
+        f.write(json.dumps(room_jids))
+
+
+def add_room(server, xmpp):
+    global rooms_join_unsaved
     name = xmpp.split('@')[0].split('_', 1)[1]
 
+    weechat.prnt('', 'Join hipchat #%s' % name)
     weechat.command('', '/msg -server %s &bitlbee chat add hipchat %s #%s' % (server, name, name))
-    weechat.command('', '/msg -server %s &bitlbee save' % server)
     weechat.command('', '/join -server %s #%s' % (server, name))
-    return weechat.WEECHAT_RC_OK
+    rooms_join_unsaved = True
+
+
+def add_room_save(server):
+    global rooms_join_unsaved
+    if rooms_join_pending or not rooms_join_unsaved:
+        return
+
+    weechat.command('', '/msg -server %s &bitlbee save' % server)
+    rooms_join_unsaved = False
 
 
 # Create listbuffer.
@@ -205,6 +354,7 @@ def rooms_create_buffer(bitlbee_server):
         weechat.buffer_set(rooms_buffer, "key_bind_meta2-4~", "/hipchat rooms **scroll_bottom")
         weechat.buffer_set(rooms_buffer, "key_bind_meta-ctrl-J", "/hipchat rooms **enter")
         weechat.buffer_set(rooms_buffer, "key_bind_meta-ctrl-M", "/hipchat rooms **enter")
+        weechat.buffer_set(rooms_buffer, "key_bind_meta-s", "/hipchat rooms **space")
         weechat.buffer_set(rooms_buffer, "key_bind_meta->", "/hipchat rooms **sort_next")
         weechat.buffer_set(rooms_buffer, "key_bind_meta-<", "/hipchat rooms **sort_previous")
         weechat.buffer_set(rooms_buffer, "key_bind_meta-/", "/hipchat rooms **sort_invert")
@@ -228,11 +378,15 @@ def rooms_set_buffer_title():
 
 
 def rooms_initialise_list(bitlbee_server):
-    global rooms_channels, rooms_curline, rooms_data
+    global rooms_channels, rooms_curline, rooms_data, rooms_selected, rooms_autojoin
+    global rooms_generation
 
     rooms_create_buffer(bitlbee_server)
     rooms_channels = []
     rooms_data = ''
+    rooms_selected = set()
+    rooms_autojoin = False
+    rooms_generation += 1
     return
 
 
@@ -298,6 +452,7 @@ def rooms_line_format(list_data, curr=False):
     str = ""
     if (curr):
         str += weechat.color("yellow,red")
+    str += '* ' if list_data.get('id') in rooms_selected else '  '
     channel_text = list_data['name'].ljust(int(weechat.config_get_plugin('channel_min_width')))
     str += channel_text
     str += ' (id %s)' % list_data.get('id')
@@ -336,11 +491,34 @@ def rooms_line_down():
 def rooms_line_run():
     global rooms_channels_filtered, rooms_curline
     room = rooms_channels_filtered[rooms_curline]
-    add_room_start(room)
+    rooms_join([room])
     return
 
 
 def rooms_line_select():
+    global rooms_channels_filtered, rooms_curline, rooms_selected
+    room_id = rooms_channels_filtered[rooms_curline]['id']
+    if room_id in rooms_selected:
+        rooms_selected.remove(room_id)
+    else:
+        rooms_selected.add(room_id)
+    rooms_refresh_line(rooms_curline)
+    return
+
+
+def rooms_join_selected():
+    global rooms_channels, rooms_selected
+    if rooms_selected:
+        rooms = [room for room in rooms_channels if room['id'] in rooms_selected]
+    elif rooms_autojoin:
+        rooms = rooms_channels
+    else:
+        weechat.prnt('', 'No rooms selected')
+        return
+
+    rooms_join(rooms)
+    rooms_selected = set()
+    rooms_refresh()
     return
 
 
@@ -481,6 +659,7 @@ rooms_options = {
     'down': rooms_line_down,
     'enter': rooms_line_run,
     'space': rooms_line_select,
+    'join': rooms_join_selected,
     'scroll_top': rooms_scroll_top,
     'scroll_bottom': rooms_scroll_bottom,
     'sort_next': rooms_sort_next,
@@ -498,6 +677,16 @@ def get_token():
     return api_token
 
 
+def get_startup_delay():
+    value = weechat.config_get_plugin('startup_delay')
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        default = dict((option, default) for option, default, _ in rooms_settings)['startup_delay']
+        weechat.prnt('', 'Invalid startup_delay %r, using %s instead' % (value, default))
+        return int(default)
+
+
 def complete_mention(data, item, buffer, completion):
     input = decode(weechat.buffer_get_string(buffer, 'input')).split(' ')
     word = input[-1]
@@ -505,6 +694,7 @@ def complete_mention(data, item, buffer, completion):
         return weechat.WEECHAT_RC_OK
 
     search = word[1:]
+    nicklist_ensure()
 
     nicklist = weechat.infolist_get('nicklist', buffer, '')
     while weechat.infolist_next(nicklist):
@@ -534,8 +724,21 @@ def encode(u):
     return u
 
 
-def nicklist_download(url=None):
-    global nicklist_data, nicklist
+def nicklist_ensure():
+    """Load and sync the user and room lists on first use, unless that has already been done."""
+    if nicklist is None:
+        nicklist_load()
+        nicklist_download()
+        room_index_download()
+
+
+def nicklist_startup_cb(data, remaining_calls):
+    nicklist_ensure()
+    return weechat.WEECHAT_RC_OK
+
+
+def nicklist_load():
+    global nicklist
 
     f = os.path.join(hipchat_dir(), 'nicks.json')
     if os.path.exists(f):
@@ -545,9 +748,53 @@ def nicklist_download(url=None):
 
     if nicklist is None:
         nicklist = {}
+    nicklist_index()
+
 
+def nicklist_index():
+    global nicklist_mentions
+    nicklist_mentions = dict((mention.lower(), nick) for mention, nick in nicklist.items())
+
+
+def room_index_download(url=None):
+    if not url:
+        url = 'https://api.hipchat.com/v2/room?max-results=1000'
+        if fetch_worker_enabled():
+            fetch_worker_start('room_index', url)
+            return
+
+    weechat.hook_process('url:%s&auth_token=%s' % (url, get_token()),
+                         30000, 'room_index_download_cb', '')
+
+
+def room_index_download_cb(data, command, rc, out, err):
+    global room_index_data
+
+    try:
+        data = json.loads(room_index_data + out)
+        room_index_add(data['items'])
+
+        room_index_data = ''
+        next = data.get('links', {}).get('next')
+        if next:
+            room_index_download(next)
+    except (TypeError, ValueError):
+        if out:
+            room_index_data += out
+    return weechat.WEECHAT_RC_OK
+
+
+def room_index_add(items):
+    for d in items:
+        room_index[d['id']] = d
+
+
+def nicklist_download(url=None):
     if not url:
         url = 'https://api.hipchat.com/v2/user?max-results=1000'
+        if fetch_worker_enabled():
+            fetch_worker_start('users', url)
+            return
 
     weechat.hook_process('url:%s&auth_token=%s' % (url, get_token()),
                          30000, 'nicklist_download_cb', '')
@@ -561,26 +808,109 @@ def nicklist_download_cb(data, command, rc, out, err):
 
     try:
         data = json.loads(nicklist_data + out)
-        for nick in data['items']:
-            nicklist[nick['mention_name']] = nick
+        nicklist_add(data['items'])
 
         nicklist_data = ''
         next = data.get('links', {}).get('next')
         if next:
             nicklist_download(next)
         else:
-            f = os.path.join(hipchat_dir(), 'nicks.json')
-            with open(f, 'w') as f:
-                f.write(json.dumps(nicklist))
-            update_all_fullnames()
-            weechat.hook_signal_send('hipchat_nicks_downloaded', weechat.WEECHAT_HOOK_SIGNAL_STRING,
-                                     '')
+            nicklist_download_end()
     except (TypeError, ValueError):
         if out:
             nicklist_data += out
     return weechat.WEECHAT_RC_OK
 
 
+def nicklist_add(items):
+    for nick in items:
+        nicklist[nick['mention_name']] = nick
+
+
+def nicklist_download_end():
+    f = os.path.join(hipchat_dir(), 'nicks.json')
+    with open(f, 'w') as f:
+        f.write(json.dumps(nicklist))
+    nicklist_index()
+    update_all_fullnames()
+    weechat.hook_signal_send('hipchat_nicks_downloaded', weechat.WEECHAT_HOOK_SIGNAL_STRING, '')
+
+
+def fetch_worker_enabled():
+    version = weechat.info_get('version_number', '') or 0
+    return weechat.config_get_plugin('fetch_worker') == 'on' and int(version) >= 0x01050000
+
+
+def fetch_worker_start(kind, url, generation=0):
+    global fetch_worker_seq
+    fetch_worker_seq += 1
+    weechat.hook_process('func:fetch_worker', 120 * 1000, 'fetch_worker_cb',
+                         '%s %s %s %s %s' % (fetch_worker_seq, kind, generation, get_token(), url))
+
+
+def fetch_worker(data):
+    """Runs in a child process: download all pages and return the fields we use.
+
+    The output is UTF-8 text. The first line holds an error message, if any, and every
+    following line holds one item, with its fields separated by tabs.
+    """
+    seq, kind, generation, token, url = data.split(' ', 4)
+    fields = fetch_worker_fields[kind]
+    lines = [u'']
+    try:
+        while url:
+            page = json.load(urllib2.urlopen('%s&auth_token=%s' % (url, token), timeout=30))
+            for item in page['items']:
+                lines.append(u'\t'.join(u' '.join(unicode(item[k]).split()) for k in fields))
+            url = page.get('links', {}).get('next')
+    except (IOError, KeyError, ValueError) as e:
+        lines[0] = u' '.join(str(e).decode('utf-8', 'replace').split()) or u'unknown error'
+    return u'\n'.join(lines).encode('utf-8')
+
+
+def fetch_worker_cb(data, command, rc, out, err):
+    global nicklist
+    seq, kind, generation = data.split(' ', 3)[:3]
+    fetch_worker_output[seq] = fetch_worker_output.get(seq, '') + out
+    if int(rc) == weechat.WEECHAT_HOOK_PROCESS_RUNNING:
+        return weechat.WEECHAT_RC_OK
+
+    output = fetch_worker_output.pop(seq)
+    if not output:
+        weechat.prnt('', 'Failed to download Hipchat %s: %s' % (kind, err))
+        return weechat.WEECHAT_RC_OK
+
+    lines = output.decode('utf-8').split(u'\n')
+    error = lines[0]
+    if error:
+        weechat.prnt('', 'Failed to download Hipchat %s: %s' % (kind, encode(error)))
+
+    fields = fetch_worker_fields[kind]
+    items = []
+    for line in lines[1:]:
+        item = dict(zip(fields, line.split(u'\t')))
+        item['id'] = int(item['id'])
+        items.append(item)
+
+    if kind == 'users':
+        if nicklist is None:
+            nicklist = {}
+        nicklist_add(items)
+        if error:
+            nicklist_index()
+        else:
+            nicklist_download_end()
+    elif kind == 'room_index':
+        room_index_add(items)
+    elif int(generation) == rooms_generation:
+        rooms_list_add(items)
+        if error:
+            rooms_list_end()
+        else:
+            rooms_list_done(kind)
+    return weechat.WEECHAT_RC_OK
+
+
 def hipchat_dir():
     path = os.path.join(weechat.info_get('weechat_dir', ''), 'hipchat')
     if not os.path.exists(path):
@@ -626,7 +956,8 @@ def update_fullname_join(data, signal, signal_data):
         return
 
     if nicklist is None:
-        nicklist_download()
+        nicklist_ensure()
+    if not nicklist:
         return weechat.WEECHAT_RC_OK
 
     buffer, user = signal_data.split(',', 1)
@@ -634,6 +965,79 @@ def update_fullname_join(data, signal, signal_data):
     return weechat.WEECHAT_RC_OK
 
 
+def find_user(name):
+    nicklist_ensure()
+    return nicklist_mentions.get(name.lstrip('@').lower())
+
+
+def info_cb(data, info_name, arguments):
+    user = find_user(decode(arguments))
+    if not user:
+        return ''
+    if info_name == 'hipchat_fullname':
+        return encode(user['name'])
+    return encode(user['mention_name'])
+
+
+def infolist_user_cb(data, infolist_name, pointer, arguments):
+    infolist = weechat.infolist_new()
+    user = find_user(decode(arguments))
+    if user:
+        item = weechat.infolist_new_item(infolist)
+        for key in ('mention_name', 'name'):
+            weechat.infolist_new_var_string(item, key, encode(user[key]))
+        weechat.infolist_new_var_integer(item, 'id', user['id'])
+    return infolist
+
+
+def infolist_room_cb(data, infolist_name, pointer, arguments):
+    nicklist_ensure()
+    room_jids_load()
+    infolist = weechat.infolist_new()
+    for room_id, room in sorted(room_index.items()):
+        name = encode(room['name'])
+        if arguments and not weechat.string_match(name, arguments, 0):
+            continue
+        item = weechat.infolist_new_item(infolist)
+        weechat.infolist_new_var_integer(item, 'id', room_id)
+        weechat.infolist_new_var_string(item, 'name', name)
+        xmpp = room.get('xmpp_jid') or room_jids.get(str(room_id), '')
+        weechat.infolist_new_var_string(item, 'xmpp_jid', encode(xmpp))
+    return infolist
+
+
+def mention_decode(data, modifier, modifier_data, string):
+    if not nicklist_mentions or weechat.config_get_plugin('annotate_mentions') != 'on':
+        return string
+    if modifier_data != weechat.config_get_plugin('server'):
+        return string
+
+    msg = string.split(' ', 3)
+    if len(msg) < 4 or '@' not in msg[3]:
+        return string
+
+    own = (weechat.config_get_plugin('mention_name') or
+           weechat.info_get('irc_nick', modifier_data)).lower()
+
+    def annotate(match):
+        mention = match.group(1)
+        nick = mention and nicklist_mentions.get(mention.lower())
+        if not nick:
+            return match.group(0)
+        if mention.lower() == own:
+            mention_highlight(modifier_data, msg[2], mention)
+        return '%s (%s)' % (match.group(0), encode(nick['name']))
+
+    return '%s %s' % (' '.join(msg[:-1]), mention_re.sub(annotate, msg[3]))
+
+
+def mention_highlight(server, channel, mention):
+    buffer = weechat.info_get('irc_buffer', '%s,%s' % (server, channel))
+    if buffer and buffer not in mention_highlight_buffers:
+        weechat.buffer_set(buffer, 'highlight_words_add', '@%s' % mention)
+        mention_highlight_buffers.add(buffer)
+
+
 def show_nicks(args):
     global nicklist
 
@@ -650,9 +1054,9 @@ def show_nicks(args):
     weechat.buffer_set(buffer, 'localvar_set_hipchat_args', args)
 
     if nicklist is None:
-        nicklist_download()
-        return
-    show_nicks_cb('', '', '')
+        nicklist_ensure()
+    if nicklist:
+        show_nicks_cb('', '', '')
 
 
 def show_nicks_cb(data, signal, signal_data):
@@ -685,7 +1089,6 @@ def main():
 
     rooms_set_default_settings()
     rooms_reset_stored_sort_order()
-    get_token()
 
     weechat.hook_command(
         'hipchat', 'Hipchat utilities',
@@ -696,12 +1099,27 @@ def main():
         'Use * in pattern as wildcard match.\n',
         'rooms|autojoin|whois|fullnames|nicks', 'hipchat_cmd', '')
     weechat.hook_completion('hipchat_mentions', 'Mentions', 'complete_mention', '')
+    weechat.hook_info('hipchat_fullname', 'Full name of a Hipchat user', '@mention',
+                      'info_cb', '')
+    weechat.hook_info('hipchat_mention', 'Mention name of a Hipchat user', '@mention',
+                      'info_cb', '')
+    weechat.hook_infolist('hipchat_user', 'Hipchat user', '', '@mention',
+                          'infolist_user_cb', '')
+    weechat.hook_infolist('hipchat_room', 'Known Hipchat rooms', '',
+                          'room name pattern (can use * as wildcard)', 'infolist_room_cb', '')
 
-    if weechat.config_get_plugin('enable_fullnames') == 'on':
-        nicklist_download()
     weechat.hook_signal('nicklist_nick_added', 'update_fullname_join', '')
+    # Lower than the default priority so html.py has already decoded links.
+    weechat.hook_modifier('500|irc_in_privmsg', 'mention_decode', '')
     weechat.hook_signal('hipchat_nicks_downloaded', 'show_nicks_cb', '')
 
+    if weechat.config_get_plugin('enable_fullnames') == 'on':
+        delay = get_startup_delay()
+        if delay > 0:
+            weechat.hook_timer(delay * 1000, 0, 1, 'nicklist_startup_cb', '')
+        else:
+            nicklist_ensure()
+
 
 if __name__ == '__main__':
     main()
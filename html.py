@@ -1,5 +1,15 @@
-"""This plugin decodes messages with <a> tags into plain text messages."""
+"""This plugin decodes messages with <a> tags into plain text messages.
+
+Links are also logged to a fixed size ring file in the weechat directory, which can be
+searched with:
+
+/html urls <pattern>  # list logged links, optionally filter by pattern (supports *)
+"""
 from HTMLParser import HTMLParser
+import mmap
+import os
+import struct
+import time
 import weechat
 
 SCRIPT_NAME = 'html'
@@ -8,12 +18,21 @@ SCRIPT_VERSION = '0.1.0'
 SCRIPT_LICENSE = 'MIT'
 SCRIPT_DESC = 'HTML decoding of messages'
 
+URL_RING_MAGIC = 'URLRING1'
+URL_RING_HEADER = struct.Struct('<8sI')
+URL_RING_SLOTS = 10000
+URL_RING_RECORD = 512
+
+url_ring = None
+url_ring_next = 0
+
 
 class Parser(HTMLParser):
 
     def __init__(self):
         HTMLParser.__init__(self)
         self.out = []
+        self.links = []
         self.in_a = False
         self.data = None
         self.href = None
@@ -29,6 +48,8 @@ class Parser(HTMLParser):
             self.out.append(self.data or '')
             self.out.append(': ')
             self.out.append(self.href)
+            if self.href:
+                self.links.append((self.data or '', self.href))
 
     def handle_data(self, data):
         if self.in_a:
@@ -41,20 +62,129 @@ def html_decode(data, modifier, modifier_data, string):
     msg = string.split(' ', 3)
     text = msg[3][1:]
     if '<' in text and '>' in text:
+        links = None
         try:
             p = Parser()
-            p.feed(text)
+            try:
+                p.feed(text)
+            except UnicodeDecodeError:
+                # Entities in attributes are unescaped to unicode, which can't be mixed with
+                # other non-ASCII bytes, so parse the message as unicode instead.
+                p = Parser()
+                p.feed(text.decode('utf-8', 'replace'))
 
-            text = ''.join((str(e) for e in p.out))
+            text = ''.join((encode(e) if isinstance(e, unicode) else str(e) for e in p.out))
             string = '%s :%s' % (' '.join(msg[:-1]), text)
+            links = p.links
         except Exception as e:
             weechat.prnt('', 'Parse error: %s' % e)
 
+        if links:
+            nick = msg[0][1:].split('!')[0]
+            channel = msg[2]
+            if channel == weechat.info_get('irc_nick', modifier_data):
+                channel = nick
+            url_ring_append(modifier_data, channel, nick, links)
+
     return string
 
 
+def url_ring_open():
+    """Map the ring file, creating it if it doesn't exist or has the wrong size."""
+    global url_ring, url_ring_next
+
+    path = os.path.join(weechat.info_get('weechat_dir', ''), 'html_urls.ring')
+    size = URL_RING_HEADER.size + URL_RING_SLOTS * URL_RING_RECORD
+    try:
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            # Write the zeros out rather than truncating, as writing to a sparse page through
+            # the mapping on a full disk raises SIGBUS.
+            with open(path, 'wb') as f:
+                f.write(URL_RING_HEADER.pack(URL_RING_MAGIC, 0))
+                for i in range(URL_RING_SLOTS):
+                    f.write('\0' * URL_RING_RECORD)
+        with open(path, 'r+b') as f:
+            url_ring = mmap.mmap(f.fileno(), size)
+    except EnvironmentError as e:
+        weechat.prnt('', 'Unable to open URL log %s: %s' % (path, e))
+        return
+
+    magic, url_ring_next = URL_RING_HEADER.unpack_from(url_ring)
+    if magic != URL_RING_MAGIC or url_ring_next >= URL_RING_SLOTS:
+        url_ring[:] = '\0' * size
+        url_ring_next = 0
+        URL_RING_HEADER.pack_into(url_ring, 0, URL_RING_MAGIC, url_ring_next)
+
+
+def url_ring_append(server, channel, nick, links):
+    global url_ring_next
+    if url_ring is None:
+        return
+
+    prefix = '%d\t%s\t%s\t%s\t' % (time.time(), server, channel, nick)
+    try:
+        for text, href in links:
+            if '\t' in text or '\n' in text:
+                text = ' '.join(text.split())
+            record = '%s%s\t%s' % (prefix, encode(href), encode(text))
+            if len(record) >= URL_RING_RECORD:
+                record = truncate(record, URL_RING_RECORD - 1)
+            # Records are terminated by a NUL, so the rest of the slot can be left as is.
+            offset = URL_RING_HEADER.size + url_ring_next * URL_RING_RECORD
+            url_ring[offset:offset + len(record) + 1] = record + '\0'
+            url_ring_next = (url_ring_next + 1) % URL_RING_SLOTS
+        URL_RING_HEADER.pack_into(url_ring, 0, URL_RING_MAGIC, url_ring_next)
+    except (IndexError, ValueError) as e:
+        weechat.prnt('', 'Unable to log URL: %s' % e)
+
+
+def encode(u):
+    if isinstance(u, unicode):
+        u = u.encode('utf-8')
+    return u
+
+
+def truncate(s, length):
+    """Cut UTF-8 encoded s to at most length bytes without splitting a character."""
+    while length > 0 and (ord(s[length]) & 0xC0) == 0x80:
+        length -= 1
+    return s[:length]
+
+
+def url_ring_search(pattern):
+    """Yield logged links matching pattern, oldest first."""
+    if url_ring is None:
+        return
+
+    for i in range(URL_RING_SLOTS):
+        offset = URL_RING_HEADER.size + ((url_ring_next + i) % URL_RING_SLOTS) * URL_RING_RECORD
+        if url_ring[offset] == '\0':
+            continue
+        record = url_ring[offset:offset + URL_RING_RECORD].split('\0', 1)[0]
+        if not pattern or weechat.string_match(record, pattern, 0):
+            yield record.split('\t')
+
+
+def html_cmd(data, buffer, args):
+    if args.startswith('urls'):
+        pattern = args[4:].strip()
+        if pattern and '*' not in pattern:
+            pattern = '*%s*' % pattern
+        for fields in url_ring_search(pattern):
+            ts, server, channel, nick, href, text = (fields + [''] * 6)[:6]
+            weechat.prnt(buffer, '%s %s/%s <%s> %s: %s' % (
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(int(ts))),
+                server, channel, nick, text, href))
+    return weechat.WEECHAT_RC_OK
+
+
 def main():
+    url_ring_open()
     weechat.hook_modifier("irc_in_privmsg", "html_decode", "")
+    weechat.hook_command(
+        'html', 'HTML decoding utilities', 'urls [<pattern>]',
+        'urls <pattern>: List logged links, optionally by pattern. Use * in pattern as '
+        'wildcard match.\n', 'urls', 'html_cmd', '')
 
 
 if __name__ == '__main__' and weechat.register(